@@ -0,0 +1,68 @@
+"""
+Shared Batch Scanning Helpers
+Fans independent per-file scans out over worker processes or threads
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+# Smaller batches are scanned serially; pool start-up would outweigh the overlap
+MIN_PARALLEL_SCAN_BATCH = 8
+
+# Forking a parent that runs other threads (the ensemble's pool) can copy a held lock
+# into the child and deadlock it, so workers are started fresh instead
+_WORKER_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Scanner instance owned by each worker process, unpickled once by _init_worker
+_worker_scanner = None
+
+def _init_worker(scanner):
+    """Keep the parent's scanner, including any runtime rule edits, for this process"""
+    global _worker_scanner
+    _worker_scanner = scanner
+
+def _scan_in_worker(method_name: str, file_path: str) -> Dict:
+    """Run one scan on the worker process's scanner"""
+    return getattr(_worker_scanner, method_name)(file_path)
+
+def scan_in_parallel(scanner, method_name: str, file_paths: List[str],
+                     workers: Optional[int] = None, use_processes: bool = True) -> Dict[str, Dict]:
+    """Run scanner.<method_name>(path) over file_paths, returning {path: result}
+    
+    Worker processes sidestep the GIL for CPU-bound scans and each get a pickled copy
+    of scanner; threads suit I/O-bound batches of small files.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(file_paths) < MIN_PARALLEL_SCAN_BATCH:
+        scan = getattr(scanner, method_name)
+        return {path: scan(path) for path in file_paths}
+    
+    if use_processes:
+        # Larger chunks amortize pickling while leaving a few chunks per worker to balance load
+        chunksize = max(1, len(file_paths) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context(_WORKER_START_METHOD),
+                                 initializer=_init_worker, initargs=(scanner,)) as pool:
+            results = pool.map(partial(_scan_in_worker, method_name), file_paths, chunksize=chunksize)
+            return dict(zip(file_paths, results))
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(file_paths, pool.map(getattr(scanner, method_name), file_paths)))
+
+def scan_cached(scanner, method_name: str, file_paths: List[str], cache,
+                key_func: Callable, is_cacheable: Callable[[Dict], bool],
+                workers: Optional[int] = None, use_processes: bool = True) -> Dict[str, Dict]:
+    """scan_in_parallel over the cache misses only, storing cacheable results under key_func(path, stat)"""
+    results, pending = cache.lookup_many(file_paths, key_func)
+    if pending:
+        scanned = scan_in_parallel(scanner, method_name, list(pending), workers, use_processes)
+        for path, result in scanned.items():
+            if is_cacheable(result):
+                cache.put(pending[path], result)
+        results.update(scanned)
+    return {path: results[path] for path in file_paths}
@@ -4,10 +4,85 @@ Works without external dependencies
 """
 
 import os
+import sys
 import json
+import time
+import functools
 import psutil
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Union
+
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    from enhanced_models.keyword_matcher import KeywordMatcher
+
+# Size of a single read from /proc; stat and most cmdlines fit in one call
+_PROC_READ_SIZE = 65536
+
+def _read_proc_file(path: str) -> bytes:
+    """Read a small /proc file with one open/read/close sequence"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        while True:
+            chunk = os.read(fd, _PROC_READ_SIZE)
+            chunks.append(chunk)
+            if len(chunk) < _PROC_READ_SIZE:
+                return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+# The kernel truncates comm (the stat name) to this many characters
+_COMM_MAX_LENGTH = 15
+
+# Kernel threads carry this flag in /proc/[pid]/stat and never have a cmdline
+_PF_KTHREAD = 0x00200000
+
+def _parse_proc_stat(buf: bytes):
+    """Parse (name, flags, utime+stime ticks, rss pages) out of a /proc/[pid]/stat buffer"""
+    # comm may itself contain spaces or parentheses, so split on the last ')'
+    open_paren = buf.find(b"(")
+    close_paren = buf.rfind(b")")
+    name = buf[open_paren + 1:close_paren].decode("utf-8", "replace")
+    # Fields after comm start at field 3 (state); flags is 9, utime/stime are 14/15, rss is 24
+    fields = buf[close_paren + 2:].split()
+    return name, int(fields[6]), int(fields[11]) + int(fields[12]), int(fields[21])
+
+# Name lists rarely change, so only a few lowered versions are kept
+@functools.lru_cache(maxsize=8)
+def _lowered_name_set(names: tuple) -> frozenset:
+    return frozenset(name.lower() for name in names)
+
+@functools.lru_cache(maxsize=8)
+def _keyword_matcher(keywords: tuple) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+# Process records are stored column-wise: one parallel list per field
+PROCESS_FIELDS = ("pid", "name", "cmdline", "cpu_percent", "memory_percent")
+
+def _empty_process_table() -> Dict[str, List]:
+    return {field: [] for field in PROCESS_FIELDS}
+
+def as_process_table(processes: Union[Dict[str, List], List[Dict]]) -> Dict[str, List]:
+    """Return processes in column layout, converting a legacy list of per-process dicts"""
+    if isinstance(processes, dict):
+        return processes
+    table = _empty_process_table()
+    for proc in processes:
+        for field in PROCESS_FIELDS:
+            table[field].append(proc.get(field))
+    return table
+
+def process_record(table: Dict[str, List], index: int) -> Dict:
+    """Build the per-process dict for one row of a process table"""
+    return {field: table[field][index] for field in PROCESS_FIELDS}
+
+def iter_processes(processes: Union[Dict[str, List], List[Dict]]) -> Iterator[Dict]:
+    """Yield per-process dicts from either layout (backward-compatible view)"""
+    table = as_process_table(processes)
+    for index in range(len(table["pid"])):
+        yield process_record(table, index)
 
 class BehavioralAnalyzer:
     """Simplified behavioral analysis for zero-day and fileless threats"""
@@ -22,77 +97,180 @@ class BehavioralAnalyzer:
             "DownloadString", "Invoke-Expression", "IEX", "Invoke-WebRequest",
             "net user", "net group", "wmic", "schtasks"
         ]
+        self._malware_ports = frozenset([4444, 8080, 9999, 1337])  # Common malware ports
+        
+        # Read /proc directly on Linux instead of going through psutil per process
+        self._use_procfs = (
+            self.config.get('use_procfs', True)
+            and sys.platform.startswith('linux')
+            and os.path.isdir('/proc')
+        )
+        self._proc_cpu_times = {}
+        if self._use_procfs:
+            self._page_size = os.sysconf('SC_PAGE_SIZE')
+            self._clock_ticks = os.sysconf('SC_CLK_TCK')
+        
+        # Prime the system CPU counter so later non-blocking samples have a baseline
+        psutil.cpu_percent(interval=None)
+        
+        # System-wide metrics change slowly; refresh them less often than process data
+        self._sys_metrics_cache = {'ts': 0.0, 'val': {}}
+        self._sys_metrics_ttl = float(self.config.get('system_metrics_ttl', 2.0))
     
-    def collect_behavioral_data(self) -> Dict:
-        """Collect current system behavioral data"""
+    def collect_behavioral_data(self, collect_network: bool = True) -> Dict:
+        """Collect current system behavioral data (network connections only if collect_network)"""
+        timestamp = datetime.now().isoformat()
         try:
             data = {
-                "timestamp": datetime.now().isoformat(),
-                "processes": [],
+                "timestamp": timestamp,
+                "processes": _empty_process_table(),
                 "network_connections": [],
                 "system_metrics": {}
             }
             
             # Collect process information
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'cpu_percent', 'memory_percent']):
+            if self._use_procfs:
                 try:
-                    proc_info = proc.info
-                    data["processes"].append({
-                        "pid": proc_info['pid'],
-                        "name": proc_info['name'],
-                        "cmdline": proc_info['cmdline'],
-                        "cpu_percent": proc_info['cpu_percent'],
-                        "memory_percent": proc_info['memory_percent']
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+                    data["processes"] = self._collect_proc_linux()
+                except OSError:
+                    data["processes"] = self._collect_proc_psutil()
+            else:
+                data["processes"] = self._collect_proc_psutil()
             
-            # Collect network connections
-            try:
-                connections = psutil.net_connections(kind='inet')
-                for conn in connections[:50]:  # Limit to first 50 connections
-                    data["network_connections"].append({
-                        "local_address": f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else None,
-                        "remote_address": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else None,
-                        "status": conn.status,
-                        "pid": conn.pid
-                    })
-            except:
-                pass
+            # Collect network connections (skippable: this scans every /proc/net table)
+            if collect_network:
+                try:
+                    connections = psutil.net_connections(kind='inet')
+                    for conn in connections[:50]:  # Limit to first 50 connections
+                        data["network_connections"].append({
+                            "local_address": f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else None,
+                            "remote_address": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else None,
+                            "remote_port": conn.raddr.port if conn.raddr else None,
+                            "status": conn.status,
+                            "pid": conn.pid
+                        })
+                except:
+                    pass
             
-            # Collect system metrics
-            try:
-                data["system_metrics"] = {
-                    "cpu_percent": psutil.cpu_percent(interval=1),
-                    "memory_percent": psutil.virtual_memory().percent,
-                    "disk_usage": psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:').percent
-                }
-            except:
-                pass
+            # Collect system metrics (cached for system_metrics_ttl seconds)
+            now = time.monotonic()
+            if now - self._sys_metrics_cache['ts'] >= self._sys_metrics_ttl:
+                try:
+                    self._sys_metrics_cache['val'] = {
+                        # Non-blocking: usage since the previous call (0.0 if called back-to-back)
+                        "cpu_percent": psutil.cpu_percent(interval=None),
+                        "memory_percent": psutil.virtual_memory().percent,
+                        "disk_usage": psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:').percent
+                    }
+                    self._sys_metrics_cache['ts'] = now
+                except:
+                    pass
+            data["system_metrics"] = dict(self._sys_metrics_cache['val'])
             
             return data
-            
+        
         except Exception as e:
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "error": str(e),
-                "processes": [],
+                "processes": _empty_process_table(),
                 "network_connections": [],
                 "system_metrics": {}
             }
     
+    def _collect_proc_psutil(self) -> Dict[str, List]:
+        """Collect process information through psutil (portable path)"""
+        processes = _empty_process_table()
+        pids, names, cmdlines, cpu_percents, memory_percents = (processes[field] for field in PROCESS_FIELDS)
+        for pid, name, cmdline, cpu_percent, memory_percent in self._iter_psutil_processes():
+            pids.append(pid)
+            names.append(name)
+            cmdlines.append(cmdline)
+            cpu_percents.append(cpu_percent)
+            memory_percents.append(memory_percent)
+        return processes
+    
+    @staticmethod
+    def _iter_psutil_processes() -> Iterator[tuple]:
+        """Yield (pid, name, cmdline, cpu%, mem%) rows, skipping dead or inaccessible processes"""
+        for proc in psutil.process_iter(['pid']):
+            try:
+                # oneshot() caches the underlying syscalls across the attribute reads
+                with proc.oneshot():
+                    row = (proc.pid, proc.name(), proc.cmdline(), proc.cpu_percent(), proc.memory_percent())
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            yield row
+    
+    def _collect_proc_linux(self) -> Dict[str, List]:
+        """Collect process information straight from /proc/[pid]/stat and cmdline"""
+        processes = _empty_process_table()
+        pids, names, cmdlines, cpu_percents, memory_percents = (processes[field] for field in PROCESS_FIELDS)
+        total_memory = psutil.virtual_memory().total
+        page_size = self._page_size
+        clock_ticks = self._clock_ticks
+        previous_times = self._proc_cpu_times
+        current_times = {}
+        now = time.monotonic()
+        
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                stat_buf = _read_proc_file(f"/proc/{entry}/stat")
+                name, flags, cpu_ticks, rss_pages = _parse_proc_stat(stat_buf)
+                # Skip the cmdline open/read/close for kernel threads (often most PIDs)
+                cmdline_buf = b"" if flags & _PF_KTHREAD else _read_proc_file(f"/proc/{entry}/cmdline")
+            except (OSError, ValueError, IndexError):
+                continue  # Process exited, is not readable, or left a short/empty stat line
+            
+            pid = int(entry)
+            current_times[pid] = (cpu_ticks, now)
+            
+            # CPU percent is the delta since the previous collection, like psutil
+            cpu_percent = 0.0
+            previous = previous_times.get(pid)
+            if previous and now > previous[1]:
+                cpu_percent = max(0.0, (cpu_ticks - previous[0]) / clock_ticks / (now - previous[1]) * 100)
+            
+            cmdline_buf = cmdline_buf.rstrip(b"\0")
+            cmdline = [arg.decode("utf-8", "replace") for arg in cmdline_buf.split(b"\0")] if cmdline_buf else []
+            if len(name) >= _COMM_MAX_LENGTH and cmdline:
+                # Recover the full name from argv[0] when comm was truncated, as psutil does
+                exe_name = os.path.basename(cmdline[0])
+                if exe_name.startswith(name):
+                    name = exe_name
+            pids.append(pid)
+            names.append(name)
+            cmdlines.append(cmdline)
+            cpu_percents.append(cpu_percent)
+            memory_percents.append(rss_pages * page_size / total_memory * 100)
+        
+        self._proc_cpu_times = current_times
+        return processes
+    
     def analyze_behavior(self, data: Dict) -> Dict:
         """Analyze behavioral data for threats"""
+        timestamp = datetime.now().isoformat()
         try:
             threats_detected = []
             threat_types = []
             risk_score = 0.0
             
-            # Analyze processes
+            processes = as_process_table(data.get("processes", []))
+            names = processes["name"]
+            
+            # Pre-bind attribute lookups used inside the per-process loops
+            suspicious_procs = _lowered_name_set(tuple(self.suspicious_processes))
+            find_commands = _keyword_matcher(tuple(self.suspicious_commands)).find_all
+            malware_ports = self._malware_ports
+            
+            # Analyze processes (only matching rows are materialized as dicts)
             suspicious_processes = []
-            for proc in data.get("processes", []):
-                if proc["name"].lower() in [p.lower() for p in self.suspicious_processes]:
-                    suspicious_processes.append(proc)
+            add_process = suspicious_processes.append
+            for index, name in enumerate(names):
+                if name.lower() in suspicious_procs:
+                    add_process(process_record(processes, index))
                     risk_score += 0.2
             
             if suspicious_processes:
@@ -105,16 +283,19 @@ class BehavioralAnalyzer:
             
             # Analyze command lines
             suspicious_commands = []
-            for proc in data.get("processes", []):
-                cmdline = " ".join(proc.get("cmdline", []))
-                for cmd in self.suspicious_commands:
-                    if cmd.lower() in cmdline.lower():
-                        suspicious_commands.append({
-                            "process": proc["name"],
-                            "command": cmd,
-                            "full_cmdline": cmdline
-                        })
-                        risk_score += 0.3
+            add_command = suspicious_commands.append
+            for name, argv in zip(names, processes["cmdline"]):
+                if not argv:
+                    continue  # Kernel threads and inaccessible processes have no cmdline
+                # Keywords like "net user" span argv elements, so match on the joined line
+                cmdline = " ".join(argv)
+                for cmd in find_commands(cmdline.lower()):
+                    add_command({
+                        "process": name,
+                        "command": cmd,
+                        "full_cmdline": cmdline
+                    })
+                    risk_score += 0.3
             
             if suspicious_commands:
                 threats_detected.append({
@@ -127,11 +308,15 @@ class BehavioralAnalyzer:
             # Analyze network connections
             suspicious_connections = []
             for conn in data.get("network_connections", []):
-                if conn.get("remote_address") and ":" in conn["remote_address"]:
-                    port = int(conn["remote_address"].split(":")[1])
-                    if port in [4444, 8080, 9999, 1337]:  # Common malware ports
-                        suspicious_connections.append(conn)
-                        risk_score += 0.1
+                port = conn.get("remote_port")
+                if port is None:
+                    # Externally supplied data may only carry "ip:port"; the last colon also handles IPv6
+                    remote_address = conn.get("remote_address") or ""
+                    idx = remote_address.rfind(":")
+                    port = int(remote_address[idx + 1:]) if idx >= 0 else 0
+                if port in malware_ports:
+                    suspicious_connections.append(conn)
+                    risk_score += 0.1
             
             if suspicious_connections:
                 threats_detected.append({
@@ -154,21 +339,21 @@ class BehavioralAnalyzer:
                 "threat_types": threat_types,
                 "threat_level": threat_level,
                 "overall_risk_score": min(10.0, risk_score * 10),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "analysis_summary": {
                     "suspicious_processes": len(suspicious_processes),
                     "suspicious_commands": len(suspicious_commands),
                     "suspicious_connections": len(suspicious_connections)
                 }
             }
-            
+        
         except Exception as e:
             return {
                 "threats_detected": [],
                 "threat_types": [],
                 "threat_level": "error",
                 "overall_risk_score": 0.0,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "error": str(e)
             }
 
@@ -3,11 +3,46 @@ Simplified Encrypted Threat Detector for Testing
 Works without external dependencies
 """
 
+import functools
 import json
 import re
 from datetime import datetime
 from typing import Dict, List, Any
 
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    from enhanced_models.keyword_matcher import KeywordMatcher
+
+# DNS/TLS streams repeat a small set of names, so the per-domain checks are memoized
+_DOMAIN_CHECK_CACHE_SIZE = 4096
+# Pattern lists rarely change, so only a few compiled versions are kept
+_PATTERN_CACHE_SIZE = 8
+
+@functools.lru_cache(maxsize=_PATTERN_CACHE_SIZE)
+def _compile_dga_patterns(dga_patterns: tuple):
+    """Fuse DGA patterns into one precompiled alternation (one scan per domain)"""
+    # An empty alternation would match everything; no patterns means nothing is DGA
+    return re.compile("|".join(f"(?:{p})" for p in dga_patterns)) if dga_patterns else None
+
+@functools.lru_cache(maxsize=_PATTERN_CACHE_SIZE)
+def _compile_domain_matcher(suspicious_domains: tuple) -> KeywordMatcher:
+    return KeywordMatcher(suspicious_domains)
+
+# Keyed on the pattern tuples as well, so edits to the lists are never served stale results
+@functools.lru_cache(maxsize=_DOMAIN_CHECK_CACHE_SIZE)
+def _dga_match(domain_lower: str, dga_patterns: tuple) -> bool:
+    dga_re = _compile_dga_patterns(dga_patterns)
+    return dga_re is not None and bool(dga_re.search(domain_lower))
+
+@functools.lru_cache(maxsize=_DOMAIN_CHECK_CACHE_SIZE)
+def _suspicious_domain_match(domain_lower: str, suspicious_domains: tuple) -> bool:
+    return _compile_domain_matcher(suspicious_domains).contains_any(domain_lower)
+
+@functools.lru_cache(maxsize=_PATTERN_CACHE_SIZE)
+def _port_set(suspicious_ports: tuple) -> frozenset:
+    return frozenset(suspicious_ports)
+
 class EncryptedThreatDetector:
     """Simplified encrypted threat detector"""
     
@@ -24,46 +59,52 @@ class EncryptedThreatDetector:
     
     def detect_encrypted_threats(self, network_data: Dict) -> Dict:
         """Detect encrypted threats from network data"""
+        timestamp = datetime.now().isoformat()
         try:
             threats_detected = []
             threat_types = []
             risk_score = 0.0
             
+            # Pre-bind attribute lookups used inside the per-item loops
+            add_threat = threats_detected.append
+            add_type = threat_types.append
+            is_suspicious_domain = self._is_suspicious_domain
+            is_dga_domain = self._is_dga_domain
+            
             # Analyze TLS hosts
             tls_hosts = network_data.get("tls_hosts", [])
             for host in tls_hosts:
-                if self._is_suspicious_domain(host):
-                    threats_detected.append({
+                if is_suspicious_domain(host):
+                    add_threat({
                         "type": "Suspicious TLS Host",
                         "details": {"host": host},
                         "risk_level": "medium"
                     })
-                    threat_types.append("Suspicious TLS Host")
+                    add_type("Suspicious TLS Host")
                     risk_score += 0.2
             
             # Analyze DNS queries
             dns_queries = network_data.get("dns_queries", [])
             for query in dns_queries:
-                if self._is_dga_domain(query):
-                    threats_detected.append({
+                if is_dga_domain(query):
+                    add_threat({
                         "type": "DGA Domain",
                         "details": {"domain": query},
                         "risk_level": "high"
                     })
-                    threat_types.append("DGA Domain")
+                    add_type("DGA Domain")
                     risk_score += 0.3
             
             # Analyze connections
             connections = network_data.get("connections", [])
-            for conn in connections:
-                if self._is_suspicious_connection(conn):
-                    threats_detected.append({
-                        "type": "Suspicious Connection",
-                        "details": conn,
-                        "risk_level": "medium"
-                    })
-                    threat_types.append("Suspicious Connection")
-                    risk_score += 0.1
+            for conn in self._suspicious_port_connections(connections):
+                add_threat({
+                    "type": "Suspicious Connection",
+                    "details": conn,
+                    "risk_level": "medium"
+                })
+                add_type("Suspicious Connection")
+                risk_score += 0.1
             
             # Determine threat level
             if risk_score >= 0.6:
@@ -78,26 +119,27 @@ class EncryptedThreatDetector:
                 "threat_types": threat_types,
                 "threat_level": threat_level,
                 "overall_risk_score": min(10.0, risk_score * 10),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "analysis_summary": {
                     "tls_hosts_analyzed": len(tls_hosts),
                     "dns_queries_analyzed": len(dns_queries),
                     "connections_analyzed": len(connections)
                 }
             }
-            
+        
         except Exception as e:
             return {
                 "threats_detected": [],
                 "threat_types": [],
                 "threat_level": "error",
                 "overall_risk_score": 0.0,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "error": str(e)
             }
     
     def detect_c2_communication(self, network_data: Dict) -> Dict:
         """Detect command and control communication"""
+        timestamp = datetime.now().isoformat()
         try:
             c2_indicators = []
             risk_score = 0.0
@@ -109,11 +151,9 @@ class EncryptedThreatDetector:
                 risk_score += 0.2
             
             # Check for suspicious ports
-            for conn in connections:
-                if isinstance(conn, dict) and "port" in conn:
-                    if conn["port"] in self.suspicious_ports:
-                        c2_indicators.append(f"Suspicious port: {conn['port']}")
-                        risk_score += 0.3
+            for conn in self._suspicious_port_connections(connections):
+                c2_indicators.append(f"Suspicious port: {conn['port']}")
+                risk_score += 0.3
             
             # Check for data exfiltration patterns
             dns_queries = network_data.get("dns_queries", [])
@@ -125,36 +165,33 @@ class EncryptedThreatDetector:
                 "c2_detected": len(c2_indicators) > 0,
                 "indicators": c2_indicators,
                 "risk_score": min(10.0, risk_score * 10),
-                "timestamp": datetime.now().isoformat()
+                "timestamp": timestamp
             }
-            
+        
         except Exception as e:
             return {
                 "c2_detected": False,
                 "indicators": [],
                 "risk_score": 0.0,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "error": str(e)
             }
     
     def _is_suspicious_domain(self, domain: str) -> bool:
         """Check if domain is suspicious"""
-        domain_lower = domain.lower()
-        return any(suspicious in domain_lower for suspicious in self.suspicious_domains)
+        return _suspicious_domain_match(domain.lower(), tuple(self.suspicious_domains))
     
     def _is_dga_domain(self, domain: str) -> bool:
         """Check if domain matches DGA patterns"""
-        for pattern in self.dga_patterns:
-            if re.search(pattern, domain.lower()):
-                return True
-        return False
+        return _dga_match(domain.lower(), tuple(self.dga_patterns))
     
-    def _is_suspicious_connection(self, conn: Dict) -> bool:
-        """Check if connection is suspicious"""
-        if isinstance(conn, dict):
-            port = conn.get("port", 0)
-            return port in self.suspicious_ports
-        return False
+    def _suspicious_port_connections(self, connections: List) -> List[Dict]:
+        """Return the connections whose port is suspicious, in a single pass"""
+        suspicious_ports = _port_set(tuple(self.suspicious_ports))
+        return [
+            conn for conn in connections
+            if isinstance(conn, dict) and conn.get("port", 0) in suspicious_ports
+        ]
 
 
 
@@ -3,37 +3,61 @@ Simplified Ensemble Detector for Testing
 Works without external dependencies
 """
 
+import bisect
+import importlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
 from typing import Dict, List, Any
 
-# Import simplified modules
-try:
-    from .signature_detector_simple import SignatureDetector
-    from .file_analyzer_simple import FileAnalyzer
-    from .behavioral_analyzer_simple import BehavioralAnalyzer
-    from .encrypted_detector_simple import EncryptedThreatDetector
-    from .social_engineering_detector_simple import SocialEngineeringDetector
-except ImportError:
-    # Fallback imports
-    from enhanced_models.signature_detector_simple import SignatureDetector
-    from enhanced_models.file_analyzer_simple import FileAnalyzer
-    from enhanced_models.behavioral_analyzer_simple import BehavioralAnalyzer
-    from enhanced_models.encrypted_detector_simple import EncryptedThreatDetector
-    from enhanced_models.social_engineering_detector_simple import SocialEngineeringDetector
+# Simplified detector modules: attribute -> (module, class, config key), imported on first use
+DETECTOR_SPECS = {
+    'signature_detector': ('signature_detector_simple', 'SignatureDetector', 'signature'),
+    'file_analyzer': ('file_analyzer_simple', 'FileAnalyzer', 'file_analysis'),
+    'behavioral_analyzer': ('behavioral_analyzer_simple', 'BehavioralAnalyzer', 'behavioral'),
+    'encrypted_detector': ('encrypted_detector_simple', 'EncryptedThreatDetector', 'encrypted'),
+    'social_engineering_detector': ('social_engineering_detector_simple', 'SocialEngineeringDetector', 'social_engineering')
+}
+
+def _import_detector_module(module_name: str):
+    """Import a simplified detector module, relative to this package when possible"""
+    try:
+        return importlib.import_module(f".{module_name}", __package__)
+    except (ImportError, TypeError):
+        # Fallback import
+        return importlib.import_module(f"enhanced_models.{module_name}")
+
+# Modules in increasing order of cost, so an early "high" verdict can skip the rest
+MODULE_ORDER = ("signature", "file_analysis", "encrypted", "social_engineering", "behavioral")
+
+# Expensive modules held back while the cheaper ones could still trigger an early exit
+DEFERRED_MODULES = frozenset(["behavioral"])
+
+# Highest risk (0-10) each module can contribute: signature and file results score
+# confidence * 10 and top out at 0.95 and 0.9; the others report up to 10
+MODULE_MAX_RISK = {"signature": 9.5, "file_analysis": 9.0}
+
+# Fixed module order of the weight vector used by the ensemble decision
+WEIGHT_ORDER = ("signature", "file_analysis", "behavioral", "encrypted", "social_engineering")
+
+# Lower bounds of the "medium" and "high" threat levels on the 0-10 risk scale
+THREAT_LEVEL_BOUNDS = (4.0, 7.0)
+THREAT_LEVELS = ("low", "medium", "high")
 
 class EnhancedThreatDetector:
     """Simplified ensemble threat detection class"""
     
-    def __init__(self, config: Dict = None):
+    def __init__(self, config: Dict = None, preload: bool = False):
         self.config = config or {}
         
-        # Initialize all detection modules
-        self.signature_detector = SignatureDetector(self.config.get('signature', {}))
-        self.file_analyzer = FileAnalyzer(self.config.get('file_analysis', {}))
-        self.behavioral_analyzer = BehavioralAnalyzer(self.config.get('behavioral', {}))
-        self.encrypted_detector = EncryptedThreatDetector(self.config.get('encrypted', {}))
-        self.social_engineering_detector = SocialEngineeringDetector(self.config.get('social_engineering', {}))
+        # Detection modules are built on first access; preload builds them all now
+        self._detectors = {}
+        self._detector_lock = threading.Lock()
+        if preload:
+            for name in DETECTOR_SPECS:
+                self._get_detector(name)
         
         # Detection weights
         self.detection_weights = {
@@ -43,88 +67,129 @@ class EnhancedThreatDetector:
             'encrypted': 0.15,
             'social_engineering': 0.20
         }
+        self._weight_vec = self._build_weight_vector(self.detection_weights)
+        
+        # Modules are independent, so run them concurrently (one worker per module)
+        self._pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="ensemble")
+        self.module_timeout = self.config.get('module_timeout', 30.0)
+        
+        # Short-lived cache so back-to-back detections share one process sweep
+        self._beh_cache = None
+        self._beh_cache_ts = 0.0
+        self._beh_cache_network = False
+        self._beh_ttl = float(self.config.get('behavioral_ttl', 1.0))
+        self._beh_lock = threading.Lock()
+    
+    def _get_detector(self, name: str):
+        """Return the named detection module, importing and building it on first use"""
+        detector = self._detectors.get(name)
+        if detector is None:
+            with self._detector_lock:
+                detector = self._detectors.get(name)
+                if detector is None:
+                    module_name, class_name, config_key = DETECTOR_SPECS[name]
+                    detector_class = getattr(_import_detector_module(module_name), class_name)
+                    detector = detector_class(self.config.get(config_key, {}))
+                    self._detectors[name] = detector
+        return detector
+    
+    @property
+    def signature_detector(self):
+        return self._get_detector('signature_detector')
+    
+    @property
+    def file_analyzer(self):
+        return self._get_detector('file_analyzer')
+    
+    @property
+    def behavioral_analyzer(self):
+        return self._get_detector('behavioral_analyzer')
+    
+    @property
+    def encrypted_detector(self):
+        return self._get_detector('encrypted_detector')
+    
+    @property
+    def social_engineering_detector(self):
+        return self._get_detector('social_engineering_detector')
     
     def detect_threats(self, data: Dict) -> Dict:
         """Comprehensive threat detection using all modules"""
+        timestamp = datetime.now().isoformat()
         try:
             results = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "threats_detected": [],
                 "threat_types": [],
                 "overall_risk_score": 0.0,
                 "threat_level": "low",
                 "confidence": 0.0,
-                "module_results": {}
+                "module_results": {},
+                "partial": False
             }
             
-            # Run signature detection if file path provided
+            # Build the independent module tasks for the provided inputs
+            tasks = {}
             if "file_path" in data:
-                try:
-                    sig_result = self.signature_detector.detect_threats(data["file_path"])
-                    results["module_results"]["signature"] = sig_result
-                    
-                    if sig_result.get("detected"):
-                        results["threats_detected"].append({
-                            "type": "Signature Match",
-                            "details": sig_result,
-                            "module": "signature"
-                        })
-                        results["threat_types"].append("Signature Match")
-                except Exception as e:
-                    results["module_results"]["signature"] = {"error": str(e)}
-            
-            # Run file analysis if file path provided
-            if "file_path" in data:
-                try:
-                    file_result = self.file_analyzer.predict(data["file_path"])
-                    results["module_results"]["file_analysis"] = file_result
-                    
-                    if file_result.get("prediction") in ["malicious", "suspicious"]:
-                        results["threats_detected"].append({
-                            "type": "File-based Threat",
-                            "details": file_result,
-                            "module": "file_analysis"
-                        })
-                        results["threat_types"].append("File-based Threat")
-                except Exception as e:
-                    results["module_results"]["file_analysis"] = {"error": str(e)}
-            
-            # Run behavioral analysis if system data provided
+                tasks["signature"] = (self.signature_detector.detect_threats, (data["file_path"],))
+                tasks["file_analysis"] = (self.file_analyzer.predict, (data["file_path"],))
             if "system_data" in data:
-                try:
-                    behavioral_data = self.behavioral_analyzer.collect_behavioral_data()
-                    behavioral_result = self.behavioral_analyzer.analyze_behavior(behavioral_data)
-                    results["module_results"]["behavioral"] = behavioral_result
-                    
-                    if behavioral_result.get("threats_detected"):
-                        results["threats_detected"].extend(behavioral_result["threats_detected"])
-                        results["threat_types"].extend(behavioral_result.get("threat_types", []))
-                except Exception as e:
-                    results["module_results"]["behavioral"] = {"error": str(e)}
-            
-            # Run encrypted threat detection if network data provided
+                # Supplied network data goes to the encrypted detector; skip the local socket scan
+                tasks["behavioral"] = (self._run_behavioral_analysis, ("network_data" not in data,))
             if "network_data" in data:
-                try:
-                    encrypted_result = self.encrypted_detector.detect_encrypted_threats(data["network_data"])
-                    results["module_results"]["encrypted"] = encrypted_result
-                    
-                    if encrypted_result.get("threats_detected"):
-                        results["threats_detected"].extend(encrypted_result["threats_detected"])
-                        results["threat_types"].extend(encrypted_result.get("threat_types", []))
-                except Exception as e:
-                    results["module_results"]["encrypted"] = {"error": str(e)}
-            
-            # Run social engineering detection if communication data provided
+                tasks["encrypted"] = (self.encrypted_detector.detect_encrypted_threats, (data["network_data"],))
             if "communication_data" in data:
+                tasks["social_engineering"] = (self.social_engineering_detector.detect_social_engineering, (data["communication_data"],))
+            
+            # Run modules concurrently; with early exit, expensive modules may wait their turn
+            early_exit = self.config.get('early_exit', True)
+            high_bound = THREAT_LEVEL_BOUNDS[-1]
+            ordered_modules = [module_name for module_name in MODULE_ORDER if module_name in tasks]
+            deferred_modules = [
+                module_name for module_name in ordered_modules
+                if early_exit and module_name in DEFERRED_MODULES
+            ]
+            futures = {
+                module_name: self._pool.submit(tasks[module_name][0], *tasks[module_name][1])
+                for module_name in ordered_modules
+                if module_name not in deferred_modules
+            }
+            current_risk = 0.0
+            
+            # Merge results cheapest-first, stopping once the verdict is already "high"
+            for position, module_name in enumerate(ordered_modules):
+                # Deferring only pays off while the pending cheap modules could still reach "high"
+                if deferred_modules:
+                    pending_cheap = [
+                        pending for pending in ordered_modules[position:]
+                        if pending not in deferred_modules
+                    ]
+                    if current_risk + self._max_weighted_risk(pending_cheap) < high_bound:
+                        for deferred_module in deferred_modules:
+                            futures[deferred_module] = self._pool.submit(
+                                tasks[deferred_module][0], *tasks[deferred_module][1]
+                            )
+                        deferred_modules = []
+                
+                future = futures[module_name]
                 try:
-                    se_result = self.social_engineering_detector.detect_social_engineering(data["communication_data"])
-                    results["module_results"]["social_engineering"] = se_result
-                    
-                    if se_result.get("threats_detected"):
-                        results["threats_detected"].extend(se_result["threats_detected"])
-                        results["threat_types"].extend(se_result.get("threat_types", []))
+                    module_result = future.result(timeout=self.module_timeout)
+                    self._merge_module_result(results, module_name, module_result)
+                except FuturesTimeoutError:
+                    results["module_results"][module_name] = {"error": f"Module timed out after {self.module_timeout}s"}
                 except Exception as e:
-                    results["module_results"]["social_engineering"] = {"error": str(e)}
+                    results["module_results"][module_name] = {"error": str(e)}
+                
+                remaining_modules = ordered_modules[position + 1:]
+                if early_exit and remaining_modules:
+                    decision = self._calculate_ensemble_decision(results)
+                    current_risk = decision["overall_risk_score"]
+                    if decision["threat_level"] == "high":
+                        for remaining_module in remaining_modules:
+                            if remaining_module in futures:
+                                futures[remaining_module].cancel()
+                        results["partial"] = True
+                        break
             
             # Calculate ensemble decision
             ensemble_decision = self._calculate_ensemble_decision(results)
@@ -134,7 +199,7 @@ class EnhancedThreatDetector:
             
         except Exception as e:
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "threats_detected": [],
                 "threat_types": [],
                 "overall_risk_score": 0.0,
@@ -143,41 +208,68 @@ class EnhancedThreatDetector:
                 "error": str(e)
             }
     
+    def _get_behavioral(self, collect_network: bool = True):
+        """Return (behavioral_data, behavioral_result), reusing a sample younger than the TTL"""
+        with self._beh_lock:
+            # A sample without network connections cannot serve a request that needs them
+            if (self._beh_cache is not None
+                    and time.monotonic() - self._beh_cache_ts < self._beh_ttl
+                    and (self._beh_cache_network or not collect_network)):
+                return self._beh_cache
+            
+            behavioral_data = self.behavioral_analyzer.collect_behavioral_data(collect_network=collect_network)
+            behavioral_result = self.behavioral_analyzer.analyze_behavior(behavioral_data)
+            self._beh_cache = (behavioral_data, behavioral_result)
+            self._beh_cache_ts = time.monotonic()
+            self._beh_cache_network = collect_network
+            return self._beh_cache
+    
+    def _run_behavioral_analysis(self, collect_network: bool = True) -> Dict:
+        """Collect and analyze current system behavior"""
+        return self._get_behavioral(collect_network)[1]
+    
+    def _merge_module_result(self, results: Dict, module_name: str, module_result: Dict):
+        """Record a module result and fold its threats into the combined results"""
+        results["module_results"][module_name] = module_result
+        
+        if module_name == "signature":
+            if module_result.get("detected"):
+                results["threats_detected"].append({
+                    "type": "Signature Match",
+                    "details": module_result,
+                    "module": "signature"
+                })
+                results["threat_types"].append("Signature Match")
+        
+        elif module_name == "file_analysis":
+            if module_result.get("prediction") in ["malicious", "suspicious"]:
+                results["threats_detected"].append({
+                    "type": "File-based Threat",
+                    "details": module_result,
+                    "module": "file_analysis"
+                })
+                results["threat_types"].append("File-based Threat")
+        
+        elif module_result.get("threats_detected"):
+            results["threats_detected"].extend(module_result["threats_detected"])
+            results["threat_types"].extend(module_result.get("threat_types", []))
+    
     def _calculate_ensemble_decision(self, results: Dict) -> Dict:
         """Calculate final ensemble decision"""
         try:
-            total_risk_score = 0.0
-            total_confidence = 0.0
             threat_count = len(results["threats_detected"])
             
-            # Calculate weighted scores from each module
-            for module_name, weight in self.detection_weights.items():
-                module_result = results["module_results"].get(module_name, {})
-                
-                if "error" not in module_result:
-                    # Extract risk score from module result
-                    if module_name == "signature":
-                        if module_result.get("detected"):
-                            total_risk_score += weight * module_result.get("confidence", 0.0) * 10
-                            total_confidence += weight * module_result.get("confidence", 0.0)
-                    
-                    elif module_name == "file_analysis":
-                        if module_result.get("prediction") in ["malicious", "suspicious"]:
-                            total_risk_score += weight * module_result.get("confidence", 0.0) * 10
-                            total_confidence += weight * module_result.get("confidence", 0.0)
-                    
-                    elif module_name in ["behavioral", "encrypted", "social_engineering"]:
-                        risk_score = module_result.get("overall_risk_score", 0.0)
-                        total_risk_score += weight * risk_score
-                        total_confidence += weight * (risk_score / 10.0)
+            # Weighted sums of per-module (risk, confidence) in fixed module order
+            module_results = results["module_results"]
+            total_risk_score = 0.0
+            total_confidence = 0.0
+            for weight, module_name in zip(self._weight_vec, WEIGHT_ORDER):
+                risk_score, confidence = self._module_score(module_name, module_results.get(module_name))
+                total_risk_score += weight * risk_score
+                total_confidence += weight * confidence
             
             # Determine threat level
-            if total_risk_score >= 7.0:
-                threat_level = "high"
-            elif total_risk_score >= 4.0:
-                threat_level = "medium"
-            else:
-                threat_level = "low"
+            threat_level = THREAT_LEVELS[bisect.bisect_right(THREAT_LEVEL_BOUNDS, total_risk_score)]
             
             # Calculate final confidence
             final_confidence = min(1.0, total_confidence)
@@ -198,15 +290,47 @@ class EnhancedThreatDetector:
                 "error": str(e)
             }
     
+    def _max_weighted_risk(self, module_names: List[str]) -> float:
+        """Upper bound on the ensemble risk the given modules can still add"""
+        weights = dict(zip(WEIGHT_ORDER, self._weight_vec))
+        return sum(
+            weights.get(module_name, 0.0) * MODULE_MAX_RISK.get(module_name, 10.0)
+            for module_name in module_names
+        )
+    
+    @staticmethod
+    def _build_weight_vector(weights: Dict) -> tuple:
+        """Flatten a weights dict into a tuple ordered like WEIGHT_ORDER"""
+        return tuple(weights.get(module_name, 0.0) for module_name in WEIGHT_ORDER)
+    
+    @staticmethod
+    def _module_score(module_name: str, module_result: Dict) -> tuple:
+        """Return the (risk 0-10, confidence 0-1) a module result contributes"""
+        if not module_result or "error" in module_result:
+            return 0.0, 0.0
+        
+        if module_name == "signature":
+            triggered = module_result.get("detected")
+        elif module_name == "file_analysis":
+            triggered = module_result.get("prediction") in ["malicious", "suspicious"]
+        else:
+            risk_score = module_result.get("overall_risk_score", 0.0)
+            return risk_score, risk_score / 10.0
+        
+        if triggered:
+            confidence = module_result.get("confidence", 0.0)
+            return confidence * 10, confidence
+        return 0.0, 0.0
+    
     def detect_advanced_threats(self, data: Dict) -> Dict:
         """Detect advanced threats using specialized methods"""
+        timestamp = datetime.now().isoformat()
         try:
             advanced_threats = []
             
             # Check for zero-day indicators
             if "system_data" in data:
-                behavioral_data = self.behavioral_analyzer.collect_behavioral_data()
-                behavioral_result = self.behavioral_analyzer.analyze_behavior(behavioral_data)
+                behavioral_data, behavioral_result = self._get_behavioral(collect_network="network_data" not in data)
                 
                 if behavioral_result.get("threat_level") == "high":
                     advanced_threats.append({
@@ -215,15 +339,16 @@ class EnhancedThreatDetector:
                         "indicators": behavioral_result.get("threats_detected", [])
                     })
             
-            # Check for fileless malware
+            # Check for fileless malware (reuses the sample collected above)
             if "system_data" in data:
-                behavioral_data = self.behavioral_analyzer.collect_behavioral_data()
-                for proc in behavioral_data.get("processes", []):
-                    if proc.get("name", "").lower() in ["powershell.exe", "wscript.exe", "cscript.exe"]:
+                # collect_behavioral_data always returns the column layout
+                processes = behavioral_data["processes"]
+                for name, cmdline in zip(processes["name"], processes["cmdline"]):
+                    if (name or "").lower() in ["powershell.exe", "wscript.exe", "cscript.exe"]:
                         advanced_threats.append({
                             "type": "Fileless Malware",
                             "confidence": 0.6,
-                            "indicators": [{"process": proc["name"], "cmdline": proc.get("cmdline", [])}]
+                            "indicators": [{"process": name, "cmdline": cmdline or []}]
                         })
             
             # Check for encrypted threats
@@ -238,14 +363,14 @@ class EnhancedThreatDetector:
             
             return {
                 "advanced_threats": advanced_threats,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "threat_count": len(advanced_threats)
             }
             
         except Exception as e:
             return {
                 "advanced_threats": [],
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "threat_count": 0,
                 "error": str(e)
             }
@@ -266,5 +391,6 @@ class EnhancedThreatDetector:
                     'encrypted': 0.15,
                     'social_engineering': 0.20
                 }
+            self._weight_vec = self._build_weight_vector(self.detection_weights)
         except Exception as e:
             print(f"Error updating weights: {e}")
@@ -8,6 +8,15 @@ import json
 from datetime import datetime
 from typing import Dict, List, Any
 
+try:
+    from .keyword_matcher import KeywordMatcher
+    from .scan_cache import ScanResultCache
+    from .batch_scan import scan_cached
+except ImportError:
+    from enhanced_models.keyword_matcher import KeywordMatcher
+    from enhanced_models.scan_cache import ScanResultCache
+    from enhanced_models.batch_scan import scan_cached
+
 class FileAnalyzer:
     """Simplified file-based malware analyzer"""
     
@@ -18,106 +27,135 @@ class FileAnalyzer:
             "regsvr32", "rundll32", "wscript", "cscript", "mshta"
         ]
         self.suspicious_extensions = [".exe", ".bat", ".cmd", ".ps1", ".vbs", ".js"]
+        # Files with these extensions are reported benign without reading their content
+        self.benign_extensions = set(self.config.get(
+            'benign_extensions', [".pdf", ".png", ".jpg", ".jpeg", ".gif", ".zip"]
+        ))
+        # Only the head of large files is scanned for patterns
+        self.max_scan_bytes = self.config.get('max_scan_bytes', 2_000_000)
+        # Patterns are ASCII, so file content is matched as lowercased bytes without decoding
+        self._pattern_matcher = KeywordMatcher(self.malicious_patterns, encoding='ascii')
+        self._pattern_count = len(self.malicious_patterns)
+        self._result_cache = ScanResultCache(self.config.get('cache_size', 1024))
     
     def predict(self, file_path: str) -> Dict:
-        """Analyze file for malware characteristics"""
+        """Analyze file for malware characteristics (unchanged files are served from cache)"""
+        return self._analyze_file(file_path)
+    
+    def scan_many(self, file_paths: List[str], workers: int = None, use_processes: bool = True) -> Dict[str, Dict]:
+        """Analyze many files in parallel, returning {path: result}"""
+        return scan_cached(self, '_analyze_file', file_paths, self._result_cache,
+                           self._cache_key, self._is_cacheable, workers, use_processes)
+    
+    @staticmethod
+    def _is_cacheable(result: Dict) -> bool:
+        """Errors are not cached; the file may become readable later"""
+        return result.get("prediction") != "error"
+    
+    @staticmethod
+    def _cache_key(file_path: str, st: os.stat_result) -> tuple:
+        """Cache key of a file: its extension, since verdicts depend on it, plus its identity
+        
+        Symlinks and hard links share one identity under different extensions.
+        """
+        return (os.path.splitext(file_path)[1].lower(),) + ScanResultCache.key_for_stat(st)
+    
+    @staticmethod
+    def _result(prediction: str, confidence: float, threat_type: str, timestamp: str, **extras) -> Dict:
+        """Build a prediction result; extras (features, error) follow the common fields"""
+        result = {
+            "prediction": prediction,
+            "confidence": confidence,
+            "threat_type": threat_type,
+            "timestamp": timestamp
+        }
+        result.update(extras)
+        return result
+    
+    def _binary_result(self, file_size: int, file_extension: str, timestamp: str) -> Dict:
+        """Verdict for a file whose content could not be read, from size and extension only"""
+        features = {
+            "file_size": file_size,
+            "extension": file_extension,
+            "is_binary": True
+        }
+        if file_extension in self.suspicious_extensions and file_size > 1024:
+            return self._result("suspicious", 0.6, "Suspicious Binary", timestamp, features=features)
+        else:
+            return self._result("benign", 0.8, "Clean File", timestamp, features=features)
+    
+    def _analyze_file(self, file_path: str) -> Dict:
+        """Analyze file content and metadata"""
+        timestamp = datetime.now().isoformat()
         try:
-            if not os.path.exists(file_path):
-                return {
-                    "prediction": "error",
-                    "confidence": 0.0,
-                    "threat_type": "File Not Found",
-                    "timestamp": datetime.now().isoformat(),
-                    "error": "File not found"
-                }
-            
-            # Basic file analysis
-            file_size = os.path.getsize(file_path)
             file_extension = os.path.splitext(file_path)[1].lower()
             
-            # Check file extension
-            is_suspicious_extension = file_extension in self.suspicious_extensions
-            
-            # Read file content for pattern analysis
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read().lower()
-            except:
-                # Binary file - check size and extension
-                if is_suspicious_extension and file_size > 1024:
-                    return {
-                        "prediction": "suspicious",
-                        "confidence": 0.6,
-                        "threat_type": "Suspicious Binary",
-                        "timestamp": datetime.now().isoformat(),
-                        "features": {
-                            "file_size": file_size,
-                            "extension": file_extension,
-                            "is_binary": True
-                        }
-                    }
-                else:
-                    return {
-                        "prediction": "benign",
-                        "confidence": 0.8,
-                        "threat_type": "Clean File",
-                        "timestamp": datetime.now().isoformat(),
-                        "features": {
-                            "file_size": file_size,
-                            "extension": file_extension,
-                            "is_binary": True
-                        }
-                    }
-            
-            # Analyze content for malicious patterns
-            malicious_count = 0
-            found_patterns = []
+                f = open(file_path, 'rb')
+            except FileNotFoundError:
+                return self._result("error", 0.0, "File Not Found", timestamp, error="File not found")
+            except OSError:
+                # Present but unreadable (permissions, directories): judge on size and extension
+                return self._binary_result(os.path.getsize(file_path), file_extension, timestamp)
             
-            for pattern in self.malicious_patterns:
-                if pattern.lower() in content:
-                    malicious_count += 1
-                    found_patterns.append(pattern)
-            
-            # Calculate threat score
-            threat_score = malicious_count / len(self.malicious_patterns)
-            
-            if threat_score > 0.3:
-                prediction = "malicious"
-                confidence = min(0.9, 0.5 + threat_score * 0.4)
-                threat_type = "Script-based Malware"
-            elif threat_score > 0.1:
-                prediction = "suspicious"
-                confidence = 0.6
-                threat_type = "Potentially Suspicious"
-            else:
-                prediction = "benign"
-                confidence = 0.8
-                threat_type = "Clean File"
-            
-            return {
-                "prediction": prediction,
-                "confidence": confidence,
-                "threat_type": threat_type,
-                "timestamp": datetime.now().isoformat(),
-                "features": {
-                    "file_size": file_size,
-                    "extension": file_extension,
-                    "malicious_patterns": found_patterns,
-                    "threat_score": threat_score,
-                    "pattern_count": malicious_count
-                }
-            }
+            with f:
+                # Keyed on the descriptor that is read, so the key describes the scanned content
+                st = os.fstat(f.fileno())
+                cache_key = self._cache_key(file_path, st)
+                cached = self._result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                
+                result = self._analyze_open_file(f, st.st_size, file_extension, timestamp)
             
+            if self._is_cacheable(result):
+                self._result_cache.put(cache_key, result)
+            return result
+        
         except Exception as e:
-            return {
-                "prediction": "error",
-                "confidence": 0.0,
-                "threat_type": "Analysis Error",
-                "timestamp": datetime.now().isoformat(),
-                "error": str(e)
-            }
-
-
-
-
-
+            return self._result("error", 0.0, "Analysis Error", timestamp, error=str(e))
+    
+    def _analyze_open_file(self, f, file_size: int, file_extension: str, timestamp: str) -> Dict:
+        """Analyze an open binary file from its size, extension and leading content"""
+        if file_extension in self.benign_extensions:
+            return self._result("benign", 0.8, "Clean File", timestamp, features={
+                "file_size": file_size,
+                "extension": file_extension,
+                "skipped_scan": True
+            })
+        
+        # Read file content for pattern analysis
+        try:
+            content = f.read(self.max_scan_bytes).lower()
+        except:
+            return self._binary_result(file_size, file_extension, timestamp)
+        
+        # Analyze content for malicious patterns
+        found_patterns = self._pattern_matcher.find_all(content)
+        malicious_count = len(found_patterns)
+        
+        # Calculate threat score
+        pattern_count = self._pattern_count
+        threat_score = malicious_count / pattern_count
+        
+        # Thresholds compared in integers: threat_score > 0.3 and threat_score > 0.1
+        if malicious_count * 10 > pattern_count * 3:
+            prediction = "malicious"
+            confidence = min(0.9, 0.5 + threat_score * 0.4)
+            threat_type = "Script-based Malware"
+        elif malicious_count * 10 > pattern_count:
+            prediction = "suspicious"
+            confidence = 0.6
+            threat_type = "Potentially Suspicious"
+        else:
+            prediction = "benign"
+            confidence = 0.8
+            threat_type = "Clean File"
+        
+        return self._result(prediction, confidence, threat_type, timestamp, features={
+            "file_size": file_size,
+            "extension": file_extension,
+            "malicious_patterns": found_patterns,
+            "threat_score": threat_score,
+            "pattern_count": malicious_count
+        })
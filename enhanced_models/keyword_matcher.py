@@ -0,0 +1,130 @@
+"""
+Shared Multi-Keyword Matcher
+Uses pyahocorasick when installed, falls back to plain substring checks
+"""
+
+from typing import Dict, Iterable, List, Optional, Union
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Below this many keywords, C-level `in` checks beat a Python-driven automaton walk
+AUTOMATON_MIN_KEYWORDS = 32
+
+# Up to this many keywords, scans are generated as straight-line code; larger lists
+# loop instead, since generated source and compile time grow with the list
+CODEGEN_MAX_KEYWORDS = AUTOMATON_MIN_KEYWORDS
+
+def _compile_substring_scans(lowered: List[Union[str, bytes]]):
+    """Generate find_indices/find_mask/contains_any bodies with the keywords inlined as constants
+    
+    Keywords are embedded via repr(), so any str or bytes value round-trips safely.
+    """
+    lines = ["def find_indices(text):", "    hits = []"]
+    for index, keyword in enumerate(lowered):
+        lines.append(f"    if {keyword!r} in text: hits.append({index})")
+    lines.append("    return hits")
+    
+    lines += ["def find_mask(text):", "    mask = 0"]
+    for index, keyword in enumerate(lowered):
+        # Shift at run time; inlining 1 << index as a literal grows quadratically with the list
+        lines.append(f"    if {keyword!r} in text: mask |= 1 << {index}")
+    lines.append("    return mask")
+    
+    checks = " or ".join(f"{keyword!r} in text" for keyword in lowered) or "False"
+    lines += ["def contains_any(text):", f"    return {checks}"]
+    
+    namespace: Dict = {}
+    exec(compile("\n".join(lines), "<keyword_matcher>", "exec"), namespace)
+    return namespace["find_indices"], namespace["find_mask"], namespace["contains_any"]
+
+class KeywordMatcher:
+    """Case-insensitive matcher that scans text once for a fixed keyword list
+    
+    With an encoding, keywords are matched against already-lowercased bytes instead of str.
+    """
+    
+    def __init__(self, keywords: Iterable[str], encoding: Optional[str] = None):
+        self.keywords = list(keywords)
+        self.encoding = encoding
+        self._lowered = [keyword.lower() for keyword in self.keywords]
+        self._automaton = None
+        
+        if encoding is not None:
+            # pyahocorasick matches str only, so bytes matching always uses substring checks
+            self._lowered = [keyword.encode(encoding) for keyword in self._lowered]
+        elif AHOCORASICK_AVAILABLE and len(self._lowered) >= AUTOMATON_MIN_KEYWORDS:
+            indices: Dict[str, List[int]] = {}
+            for index, keyword in enumerate(self._lowered):
+                indices.setdefault(keyword, []).append(index)
+            
+            automaton = ahocorasick.Automaton()
+            for keyword, keyword_indices in indices.items():
+                automaton.add_word(keyword, keyword_indices)
+            automaton.make_automaton()
+            self._automaton = automaton
+        
+        # Short fixed keyword lists scan fastest as straight-line code without loop overhead
+        if self._automaton is None:
+            if len(self._lowered) <= CODEGEN_MAX_KEYWORDS:
+                self._scan_indices, self._scan_mask, self._scan_any = _compile_substring_scans(self._lowered)
+            else:
+                self._scan_indices, self._scan_mask, self._scan_any = (
+                    self._loop_indices, self._loop_mask, self._loop_any
+                )
+    
+    def __reduce__(self):
+        # Generated scans and automatons cannot be pickled; worker processes rebuild them
+        return (type(self), (self.keywords, self.encoding))
+    
+    def _loop_indices(self, text_lower: Union[str, bytes]) -> List[int]:
+        """Substring-scan fallback for find_indices on large keyword lists"""
+        return [index for index, lowered in enumerate(self._lowered) if lowered in text_lower]
+    
+    def _loop_mask(self, text_lower: Union[str, bytes]) -> int:
+        """Substring-scan fallback for find_mask on large keyword lists"""
+        mask = 0
+        for index, lowered in enumerate(self._lowered):
+            if lowered in text_lower:
+                mask |= 1 << index
+        return mask
+    
+    def _loop_any(self, text_lower: Union[str, bytes]) -> bool:
+        """Substring-scan fallback for contains_any on large keyword lists"""
+        return any(lowered in text_lower for lowered in self._lowered)
+    
+    def find_indices(self, text_lower: Union[str, bytes]) -> List[int]:
+        """Return the positions of keywords found in already-lowercased text, in keyword order"""
+        if self._automaton is not None:
+            hits = set()
+            for _, keyword_indices in self._automaton.iter(text_lower):
+                hits.update(keyword_indices)
+            return sorted(hits)
+        
+        return self._scan_indices(text_lower)
+    
+    def find_mask(self, text_lower: Union[str, bytes]) -> int:
+        """Return a bitmask of keywords found in already-lowercased text; bit i is keyword i"""
+        if self._automaton is not None:
+            mask = 0
+            for _, keyword_indices in self._automaton.iter(text_lower):
+                for index in keyword_indices:
+                    mask |= 1 << index
+            return mask
+        
+        return self._scan_mask(text_lower)
+    
+    def find_all(self, text_lower: Union[str, bytes]) -> List[str]:
+        """Return the keywords found in already-lowercased text, in keyword order"""
+        keywords = self.keywords
+        return [keywords[index] for index in self.find_indices(text_lower)]
+    
+    def contains_any(self, text_lower: Union[str, bytes]) -> bool:
+        """Return True as soon as any keyword occurs in already-lowercased text"""
+        if self._automaton is not None:
+            return next(self._automaton.iter(text_lower), None) is not None
+        
+        return self._scan_any(text_lower)
@@ -0,0 +1,83 @@
+"""
+Shared File Scan Result Cache
+Bounded LRU keyed by file identity so unchanged files are not rescanned
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+class ScanResultCache:
+    """Thread-safe LRU of scan results keyed by (st_dev, st_ino, st_mtime_ns, st_ctime_ns, st_size)"""
+    
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __reduce__(self):
+        # Copies sent to worker processes start empty; locks cannot be pickled
+        return (type(self), (self.capacity,))
+    
+    @staticmethod
+    def key_for_stat(st: os.stat_result) -> tuple:
+        """Return the identity key for a stat result
+        
+        st_ctime_ns is part of the key because any write, or any os.utime() call that
+        rewinds mtime, updates it and user space cannot set it back.
+        """
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size)
+    
+    @classmethod
+    def key_for(cls, file_path: str) -> Optional[tuple]:
+        """Return the identity key of a file, or None if it cannot be stat'ed"""
+        try:
+            st = os.stat(file_path)
+        except (OSError, TypeError, ValueError):
+            return None
+        return cls.key_for_stat(st)
+    
+    def get(self, key: Optional[tuple]) -> Optional[Dict]:
+        """Return a copy of the cached result for key, or None on a miss"""
+        if key is None:
+            return None
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(result)
+    
+    def put(self, key: Optional[tuple], result: Dict):
+        """Store a result, evicting the least recently used entry when full"""
+        if key is None or self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+    
+    def lookup_many(self, file_paths: Iterable[str],
+                    key_func: Optional[Callable[[str, os.stat_result], tuple]] = None
+                    ) -> Tuple[Dict[str, Dict], Dict[str, Optional[tuple]]]:
+        """Split paths into cached results and {path: key} for the ones still to scan
+        
+        key_func(path, stat) builds scanner-specific keys; the default is key_for_stat.
+        """
+        hits: Dict[str, Dict] = {}
+        pending: Dict[str, Optional[tuple]] = {}
+        for file_path in file_paths:
+            try:
+                st = os.stat(file_path)
+            except (OSError, TypeError, ValueError):
+                key = None
+            else:
+                key = key_func(file_path, st) if key_func is not None else self.key_for_stat(st)
+            cached = self.get(key)
+            if cached is not None:
+                hits[file_path] = cached
+            else:
+                pending[file_path] = key
+        return hits, pending
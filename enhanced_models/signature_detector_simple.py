@@ -6,8 +6,98 @@ Works without external dependencies
 import os
 import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+try:
+    from .keyword_matcher import KeywordMatcher
+    from .scan_cache import ScanResultCache
+    from .batch_scan import scan_cached
+except ImportError:
+    from enhanced_models.keyword_matcher import KeywordMatcher
+    from enhanced_models.scan_cache import ScanResultCache
+    from enhanced_models.batch_scan import scan_cached
+
+# Read size for streaming hashes; keeps the working set small on large samples
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Read size for streaming YARA string scans
+_YARA_CHUNK_SIZE = 1 << 20
+
+# Read-ahead hint for hashing; posix_fadvise is unavailable on Windows and macOS
+_FADV_SEQUENTIAL = getattr(os, 'POSIX_FADV_SEQUENTIAL', None) if hasattr(os, 'posix_fadvise') else None
+
+# Smaller batches are hashed serially; thread start-up would outweigh the overlap
+_MIN_PARALLEL_HASH_BATCH = 8
+
+class SignatureDatabase(dict):
+    """Hex-keyed {sha256: threat} dict that keeps a raw-digest index in sync with every write"""
+    
+    def __init__(self, entries=()):
+        super().__init__()
+        self.by_digest: Dict[bytes, str] = {}
+        # Bumped on every change so cached verdicts from older signatures are not reused
+        self.version = 0
+        self.update(entries)
+    
+    def __reduce__(self):
+        # Rebuild through __init__ so the digest index exists before entries are added
+        return (type(self), (dict(self),))
+    
+    @staticmethod
+    def _digest(hex_hash) -> Optional[bytes]:
+        """Raw digest for a hex key; keys that are not hex can never match and are not indexed"""
+        try:
+            return bytes.fromhex(hex_hash)
+        except (TypeError, ValueError):
+            return None
+    
+    def _reindex(self):
+        self.by_digest = {
+            digest: threat for digest, threat in
+            ((self._digest(hex_hash), threat) for hex_hash, threat in self.items())
+            if digest is not None
+        }
+        self.version += 1
+    
+    def __setitem__(self, hex_hash, threat):
+        super().__setitem__(hex_hash, threat)
+        digest = self._digest(hex_hash)
+        if digest is not None:
+            self.by_digest[digest] = threat
+        self.version += 1
+    
+    def __delitem__(self, hex_hash):
+        super().__delitem__(hex_hash)
+        self._reindex()
+    
+    def update(self, *args, **kwargs):
+        for hex_hash, threat in dict(*args, **kwargs).items():
+            self[hex_hash] = threat
+    
+    def __ior__(self, other):
+        self.update(other)
+        return self
+    
+    def setdefault(self, hex_hash, default=None):
+        if hex_hash not in self:
+            self[hex_hash] = default
+        return self[hex_hash]
+    
+    def pop(self, hex_hash, *default):
+        result = super().pop(hex_hash, *default)
+        self._reindex()
+        return result
+    
+    def popitem(self):
+        item = super().popitem()
+        self._reindex()
+        return item
+    
+    def clear(self):
+        super().clear()
+        self._reindex()
 
 class SignatureDetector:
     """Simplified signature-based threat detector"""
@@ -16,7 +106,19 @@ class SignatureDetector:
         self.config = config or {}
         self.signature_database = {}
         self.yara_rules = {}
+        self._yara_compiled = ((), [], 0)
         self._load_sample_signatures()
+        self._result_cache = ScanResultCache(self.config.get('cache_size', 1024))
+    
+    @property
+    def signature_database(self) -> SignatureDatabase:
+        """Known-bad hashes as {hex sha256: threat type}; edits take effect on the next scan"""
+        return self._signature_database
+    
+    @signature_database.setter
+    def signature_database(self, entries: Dict[str, str]):
+        # Lookups use raw digests, which skips hex-encoding every scanned file's hash
+        self._signature_database = SignatureDatabase(entries)
     
     def _load_sample_signatures(self):
         """Load sample signatures for testing"""
@@ -36,116 +138,184 @@ class SignatureDetector:
             }
         }
     
-    def detect_threats(self, file_path: str) -> Dict:
-        """Detect threats using signature-based methods"""
+    def _get_yara_matchers(self) -> tuple:
+        """Return (rules source, [(rule_name, matcher)], chunk overlap), rebuilt when yara_rules change"""
+        source = tuple(
+            (rule_name, tuple(rule["strings"])) for rule_name, rule in self.yara_rules.items()
+        )
+        compiled = self._yara_compiled
+        if compiled[0] != source:
+            # Rule strings are ASCII, so files are matched as lowercased bytes without decoding
+            matchers = [(rule_name, KeywordMatcher(strings, encoding='ascii')) for rule_name, strings in source]
+            # Chunks overlap by this much so strings spanning a chunk boundary are still found
+            overlap = max(
+                (len(string.encode('ascii')) for _, strings in source for string in strings),
+                default=1
+            ) - 1
+            compiled = self._yara_compiled = (source, matchers, overlap)
+        return compiled
+    
+    def _cache_key(self, file_path: str, st: os.stat_result) -> tuple:
+        """Cache key of a scan: the signature and rule versions plus the file's identity"""
+        return (self._signature_database.version, self._get_yara_matchers()[0]) + ScanResultCache.key_for_stat(st)
+    
+    def hash_many(self, file_paths: List[str]) -> Dict[str, Optional[bytes]]:
+        """Hash a batch of files concurrently, returning {path: raw sha256 digest}"""
+        if len(file_paths) < _MIN_PARALLEL_HASH_BATCH:
+            return {path: self._calculate_hash(path) for path in file_paths}
+        
+        # hashlib releases the GIL while hashing, so threads hash files in parallel
+        workers = self.config.get('hash_workers', min(8, os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(file_paths, pool.map(self._calculate_hash, file_paths)))
+    
+    def detect_threats(self, file_path: str, file_hash: Optional[bytes] = None) -> Dict:
+        """Detect threats using signature-based methods (file_hash may be precomputed by hash_many)"""
+        return self._scan_file(file_path, file_hash)
+    
+    def scan_many(self, file_paths: List[str], workers: int = None, use_processes: bool = True) -> Dict[str, Dict]:
+        """Scan many files in parallel, returning {path: result}"""
+        return scan_cached(self, '_scan_file', file_paths, self._result_cache,
+                           self._cache_key, self._is_cacheable, workers, use_processes)
+    
+    @staticmethod
+    def _is_cacheable(result: Dict) -> bool:
+        """Results from unreadable files are not cached; access may be granted later"""
+        return "error" not in result and result.get("details", {}).get("hash") != "error_hash"
+    
+    @staticmethod
+    def _result(detected: bool, threat_type: str, confidence: float, method: str,
+                timestamp: str, **extras) -> Dict:
+        """Build a detection result; extras (details, error) follow the common fields"""
+        result = {
+            "detected": detected,
+            "threat_type": threat_type,
+            "confidence": confidence,
+            "method": method,
+            "timestamp": timestamp
+        }
+        result.update(extras)
+        return result
+    
+    def _scan_file(self, file_path: str, file_hash: Optional[bytes] = None) -> Dict:
+        """Run hash and YARA checks against a file (unchanged files are served from cache)"""
+        timestamp = datetime.now().isoformat()
         try:
-            if not os.path.exists(file_path):
-                return {
-                    "detected": False,
-                    "threat_type": "Unknown",
-                    "confidence": 0.0,
-                    "method": "signature",
-                    "timestamp": datetime.now().isoformat(),
-                    "error": "File not found"
-                }
-            
-            # Calculate file hash
-            file_hash = self._calculate_hash(file_path)
+            try:
+                f = open(file_path, 'rb', buffering=0)
+            except FileNotFoundError:
+                return self._result(False, "Unknown", 0.0, "signature", timestamp, error="File not found")
+            except OSError:
+                # Present but unreadable: hash and YARA checks both fail, as on a failed read
+                return self._scan_open_file(None, file_path, file_hash, timestamp)
             
-            # Check against signature database
-            if file_hash in self.signature_database:
-                return {
-                    "detected": True,
-                    "threat_type": self.signature_database[file_hash],
-                    "confidence": 0.95,
-                    "method": "signature",
-                    "timestamp": datetime.now().isoformat(),
-                    "details": {
-                        "hash": file_hash,
-                        "signature_match": True
-                    }
-                }
+            with f:
+                # Keyed on the descriptor that is read, so the key describes the scanned content.
+                # A caller-supplied hash may not match the content, so those verdicts bypass the cache.
+                cache_key = None if file_hash is not None else self._cache_key(file_path, os.fstat(f.fileno()))
+                cached = self._result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                
+                result = self._scan_open_file(f, file_path, file_hash, timestamp)
             
-            # Check with YARA rules
-            yara_result = self._check_yara_rules(file_path)
+            if self._is_cacheable(result):
+                self._result_cache.put(cache_key, result)
+            return result
+        
+        except Exception as e:
+            return self._result(False, "Error", 0.0, "signature", timestamp, error=str(e))
+    
+    def _scan_open_file(self, f, file_path: str, file_hash: Optional[bytes], timestamp: str) -> Dict:
+        """Hash and YARA checks over one open descriptor (f is None if the file could not be opened)"""
+        # Calculate file hash; a precomputed one is still checked when the file cannot be opened
+        if file_hash is None and f is not None:
+            file_hash = self._digest_file(f)
+        
+        # Check against signature database
+        threat_type = self._signature_database.by_digest.get(file_hash)
+        if threat_type is not None:
+            return self._result(True, threat_type, 0.95, "signature", timestamp, details={
+                "hash": file_hash.hex(),
+                "signature_match": True
+            })
+        
+        # Check with YARA rules
+        if f is not None:
+            yara_result = self._check_yara_rules(file_path, timestamp, f)
             if yara_result["detected"]:
                 return yara_result
-            
-            return {
-                "detected": False,
-                "threat_type": "Clean",
-                "confidence": 0.0,
-                "method": "signature",
-                "timestamp": datetime.now().isoformat(),
-                "details": {
-                    "hash": file_hash,
-                    "signature_match": False
-                }
-            }
-            
-        except Exception as e:
-            return {
-                "detected": False,
-                "threat_type": "Error",
-                "confidence": 0.0,
-                "method": "signature",
-                "timestamp": datetime.now().isoformat(),
-                "error": str(e)
-            }
+        
+        return self._result(False, "Clean", 0.0, "signature", timestamp, details={
+            "hash": file_hash.hex() if file_hash is not None else "error_hash",
+            "signature_match": False
+        })
     
-    def _calculate_hash(self, file_path: str) -> str:
-        """Calculate SHA-256 hash of file"""
+    def _calculate_hash(self, file_path: str) -> Optional[bytes]:
+        """Calculate raw SHA-256 digest of file (None if it cannot be read)"""
         try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                return hashlib.sha256(content).hexdigest()
+            with open(file_path, 'rb', buffering=0) as f:
+                return self._digest_file(f)
         except:
-            return "error_hash"
+            return None
     
-    def _check_yara_rules(self, file_path: str) -> Dict:
-        """Check file against YARA rules"""
+    @staticmethod
+    def _digest_file(f) -> Optional[bytes]:
+        """Raw SHA-256 digest of an open binary file from its current position (None on read errors)"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read().lower()
+            # Whole-file sequential read: let the kernel read ahead more aggressively
+            if _FADV_SEQUENTIAL is not None:
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, _FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+            
+            # Python 3.11+ hashes the file in a C loop that releases the GIL
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').digest()
             
-            for rule_name, rule in self.yara_rules.items():
-                matches = 0
-                for string in rule["strings"]:
-                    if string.lower() in content:
-                        matches += 1
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+            return digest.digest()
+        except:
+            return None
+    
+    def _check_yara_rules(self, file_path: str, timestamp: Optional[str] = None, f=None) -> Dict:
+        """Check file against YARA rules (f, if given, is an already-open binary handle to reuse)"""
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
+        try:
+            if f is not None:
+                f.seek(0)
+                masks = self._scan_yara_strings(f)
+            else:
+                with open(file_path, 'rb') as f:
+                    masks = self._scan_yara_strings(f)
+            
+            for (rule_name, _), mask in zip(self._get_yara_matchers()[1], masks):
+                matches = bin(mask).count("1")
                 
                 if matches >= 2:  # Simple condition check
-                    return {
-                        "detected": True,
-                        "threat_type": f"YARA: {rule_name}",
-                        "confidence": 0.8,
-                        "method": "yara",
-                        "timestamp": datetime.now().isoformat(),
-                        "details": {
-                            "rule": rule_name,
-                            "matches": matches
-                        }
-                    }
-            
-            return {
-                "detected": False,
-                "threat_type": "Clean",
-                "confidence": 0.0,
-                "method": "yara",
-                "timestamp": datetime.now().isoformat()
-            }
+                    return self._result(True, f"YARA: {rule_name}", 0.8, "yara", timestamp, details={
+                        "rule": rule_name,
+                        "matches": matches
+                    })
             
+            return self._result(False, "Clean", 0.0, "yara", timestamp)
+        
         except Exception as e:
-            return {
-                "detected": False,
-                "threat_type": "Error",
-                "confidence": 0.0,
-                "method": "yara",
-                "timestamp": datetime.now().isoformat(),
-                "error": str(e)
-            }
-
-
-
-
-
+            return self._result(False, "Error", 0.0, "yara", timestamp, error=str(e))
+    
+    def _scan_yara_strings(self, f) -> List[int]:
+        """Stream an open binary file in overlapping chunks, returning a matched-string bitmask per rule"""
+        _, rule_matchers, overlap = self._get_yara_matchers()
+        matchers = [matcher for _, matcher in rule_matchers]
+        masks = [0] * len(matchers)
+        tail = b""
+        for chunk in iter(lambda: f.read(_YARA_CHUNK_SIZE), b''):
+            window = tail + chunk.lower()
+            for index, matcher in enumerate(matchers):
+                masks[index] |= matcher.find_mask(window)
+            tail = window[-overlap:] if overlap else b""
+        return masks
@@ -6,7 +6,52 @@ Works without external dependencies
 import json
 import re
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
+from urllib.parse import urlsplit
+
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    from enhanced_models.keyword_matcher import KeywordMatcher
+
+# Shared read-only defaults for missing request fields; never mutated or returned
+_EMPTY_DICT: Dict = {}
+_EMPTY_LIST: List = []
+
+_HOST_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+
+# Shorter brands sit one edit away from ordinary words ("apple" vs "apply", "ample"),
+# so they are only matched through the explicit typosquat patterns
+_TYPOSQUAT_MIN_BRAND_LENGTH = 6
+
+# Second-level labels that sit under a country-code TLD as part of the public suffix (example.co.uk)
+_SECOND_LEVEL_SUFFIXES = frozenset(["co", "com", "net", "org", "gov", "ac", "edu"])
+
+def _registrable_label(host: str) -> str:
+    """Return the label the owner registered: paypal in login.paypal.com or paypal.co.uk"""
+    labels = host.rstrip(".").split(".")
+    if len(labels) < 2:
+        return labels[0]
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL_SUFFIXES:
+        return labels[-3]
+    return labels[-2]
+
+def _within_one_edit(token: str, brand: str) -> bool:
+    """True if token is one insertion, deletion or substitution away from brand"""
+    token_len, brand_len = len(token), len(brand)
+    if abs(token_len - brand_len) > 1 or token == brand:
+        return False
+    
+    # Skip the common prefix; the remainders must line up after the single edit
+    i = 0
+    shorter = min(token_len, brand_len)
+    while i < shorter and token[i] == brand[i]:
+        i += 1
+    if token_len == brand_len:
+        return token[i + 1:] == brand[i + 1:]
+    if token_len > brand_len:
+        return token[i + 1:] == brand[i:]
+    return token[i:] == brand[i + 1:]
 
 class SocialEngineeringDetector:
     """Simplified social engineering detector"""
@@ -28,52 +73,55 @@ class SocialEngineeringDetector:
             "verify account", "update information", "suspended account",
             "security breach", "unusual activity", "click here"
         ]
+        # One matcher over all keyword lists; each index maps back to its bucket
+        self._keyword_matcher = KeywordMatcher(
+            self.urgency_keywords + self.authority_keywords + self.phishing_indicators
+        )
+        # Matcher bits are laid out urgency, then authority, then phishing
+        urgency_len = len(self.urgency_keywords)
+        authority_len = len(self.authority_keywords)
+        phishing_len = len(self.phishing_indicators)
+        self._urgency_mask = (1 << urgency_len) - 1
+        self._authority_mask = ((1 << authority_len) - 1) << urgency_len
+        self._phishing_mask = ((1 << phishing_len) - 1) << (urgency_len + authority_len)
+        self.typosquat_brands = [
+            "google", "amazon", "paypal", "microsoft", "apple"
+        ]
+        self.typosquat_patterns = [
+            "goog1e", "amaz0n", "paypa1", "micr0soft", "app1e"
+        ]
+        self._shortener_matcher = KeywordMatcher(self.suspicious_urls)
+        self._typosquat_matcher = KeywordMatcher(self.typosquat_patterns)
     
     def detect_social_engineering(self, data: Dict) -> Dict:
         """Comprehensive social engineering detection"""
+        timestamp = datetime.now().isoformat()
         try:
-            threats_detected = []
-            threat_types = []
-            risk_score = 0.0
+            email_data = data.get("email", _EMPTY_DICT)
+            urls = data.get("urls", _EMPTY_LIST)
+            content = data.get("content", "")
             
-            # Analyze email content
-            email_data = data.get("email", {})
-            if email_data:
-                email_result = self._analyze_email(email_data)
-                if email_result["suspicious"]:
-                    threats_detected.append({
-                        "type": "Suspicious Email",
-                        "details": email_result,
-                        "risk_level": email_result["risk_level"]
-                    })
-                    threat_types.append("Suspicious Email")
-                    risk_score += email_result["risk_score"]
+            # Findings are kept as parallel lists and only zipped into records at the end
+            threat_types = []
+            threat_details = []
             
-            # Analyze URLs
-            urls = data.get("urls", [])
-            for url in urls:
-                url_result = self._analyze_url(url)
-                if url_result["suspicious"]:
-                    threats_detected.append({
-                        "type": "Suspicious URL",
-                        "details": url_result,
-                        "risk_level": url_result["risk_level"]
-                    })
-                    threat_types.append("Suspicious URL")
-                    risk_score += url_result["risk_score"]
+            # Nothing to analyze: skip straight to the zero result
+            if email_data or urls or content:
+                # Analyze email content
+                if email_data:
+                    self._record(threat_types, threat_details, "Suspicious Email", self._analyze_email(email_data))
+                
+                # Analyze URLs
+                for url in urls:
+                    self._record(threat_types, threat_details, "Suspicious URL", self._analyze_url(url))
+                
+                # Analyze general content
+                if content:
+                    self._record(threat_types, threat_details, "Suspicious Content", self._analyze_content(content))
             
-            # Analyze general content
-            content = data.get("content", "")
-            if content:
-                content_result = self._analyze_content(content)
-                if content_result["suspicious"]:
-                    threats_detected.append({
-                        "type": "Suspicious Content",
-                        "details": content_result,
-                        "risk_level": content_result["risk_level"]
-                    })
-                    threat_types.append("Suspicious Content")
-                    risk_score += content_result["risk_score"]
+            risk_score = 0.0
+            for details in threat_details:
+                risk_score += details["risk_score"]
             
             # Determine overall threat level
             if risk_score >= 0.6:
@@ -84,28 +132,38 @@ class SocialEngineeringDetector:
                 threat_level = "low"
             
             return {
-                "threats_detected": threats_detected,
+                "threats_detected": [
+                    {"type": threat_type, "details": details, "risk_level": details["risk_level"]}
+                    for threat_type, details in zip(threat_types, threat_details)
+                ],
                 "threat_types": threat_types,
                 "threat_level": threat_level,
-                "overall_risk_score": min(10.0, risk_score * 10),
-                "timestamp": datetime.now().isoformat(),
+                "overall_risk_score": 10.0 if risk_score >= 1.0 else risk_score * 10,
+                "timestamp": timestamp,
                 "analysis_summary": {
                     "email_analyzed": bool(email_data),
                     "urls_analyzed": len(urls),
                     "content_analyzed": bool(content)
                 }
             }
-            
+        
         except Exception as e:
             return {
                 "threats_detected": [],
                 "threat_types": [],
                 "threat_level": "error",
                 "overall_risk_score": 0.0,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "error": str(e)
             }
     
+    @staticmethod
+    def _record(threat_types: List[str], threat_details: List[Dict], threat_type: str, result: Dict):
+        """Keep an analyzer result if it was flagged suspicious"""
+        if result["suspicious"]:
+            threat_types.append(threat_type)
+            threat_details.append(result)
+    
     def _analyze_email(self, email_data: Dict) -> Dict:
         """Analyze email for social engineering indicators"""
         try:
@@ -113,26 +171,8 @@ class SocialEngineeringDetector:
             subject = email_data.get("subject", "").lower()
             sender = email_data.get("sender", "").lower()
             
-            risk_score = 0.0
-            indicators = []
-            
-            # Check for urgency
-            urgency_count = sum(1 for keyword in self.urgency_keywords if keyword in content or keyword in subject)
-            if urgency_count > 0:
-                indicators.append(f"Urgency detected ({urgency_count} keywords)")
-                risk_score += 0.2
-            
-            # Check for authority
-            authority_count = sum(1 for keyword in self.authority_keywords if keyword in content or keyword in subject)
-            if authority_count > 0:
-                indicators.append(f"Authority claimed ({authority_count} keywords)")
-                risk_score += 0.2
-            
-            # Check for phishing indicators
-            phishing_count = sum(1 for indicator in self.phishing_indicators if indicator in content)
-            if phishing_count > 0:
-                indicators.append(f"Phishing indicators ({phishing_count} found)")
-                risk_score += 0.3
+            urgency_count, authority_count, phishing_count, risk_score, indicators = \
+                self._score_text(content, subject)
             
             # Check sender domain
             if "@" in sender:
@@ -153,7 +193,7 @@ class SocialEngineeringDetector:
                 "authority_score": authority_count,
                 "phishing_score": phishing_count
             }
-            
+        
         except Exception as e:
             return {
                 "suspicious": False,
@@ -170,7 +210,7 @@ class SocialEngineeringDetector:
             indicators = []
             
             # Check for shortened URLs
-            if any(shortener in url_lower for shortener in self.suspicious_urls):
+            if self._shortener_matcher.contains_any(url_lower):
                 indicators.append("Shortened URL detected")
                 risk_score += 0.3
             
@@ -194,7 +234,7 @@ class SocialEngineeringDetector:
                 "indicators": indicators,
                 "url": url
             }
-            
+        
         except Exception as e:
             return {
                 "suspicious": False,
@@ -206,27 +246,8 @@ class SocialEngineeringDetector:
     def _analyze_content(self, content: str) -> Dict:
         """Analyze general content for social engineering"""
         try:
-            content_lower = content.lower()
-            risk_score = 0.0
-            indicators = []
-            
-            # Check for urgency
-            urgency_count = sum(1 for keyword in self.urgency_keywords if keyword in content_lower)
-            if urgency_count > 0:
-                indicators.append(f"Urgency detected ({urgency_count} keywords)")
-                risk_score += 0.2
-            
-            # Check for authority
-            authority_count = sum(1 for keyword in self.authority_keywords if keyword in content_lower)
-            if authority_count > 0:
-                indicators.append(f"Authority claimed ({authority_count} keywords)")
-                risk_score += 0.2
-            
-            # Check for phishing indicators
-            phishing_count = sum(1 for indicator in self.phishing_indicators if indicator in content_lower)
-            if phishing_count > 0:
-                indicators.append(f"Phishing indicators ({phishing_count} found)")
-                risk_score += 0.3
+            urgency_count, authority_count, phishing_count, risk_score, indicators = \
+                self._score_text(content.lower())
             
             suspicious = risk_score > 0.3
             risk_level = "high" if risk_score > 0.6 else "medium" if risk_score > 0.3 else "low"
@@ -240,7 +261,7 @@ class SocialEngineeringDetector:
                 "authority_score": authority_count,
                 "phishing_score": phishing_count
             }
-            
+        
         except Exception as e:
             return {
                 "suspicious": False,
@@ -249,6 +270,39 @@ class SocialEngineeringDetector:
                 "error": str(e)
             }
     
+    def _score_text(self, text_lower: str, subject_lower: str = "") -> Tuple[int, int, int, float, List[str]]:
+        """Count keyword buckets in already-lowercased text and score them in one pass
+        
+        Subject hits count toward urgency and authority only, never phishing.
+        """
+        hits = self._keyword_matcher.find_mask(text_lower)
+        if subject_lower:
+            hits |= self._keyword_matcher.find_mask(subject_lower) & ~self._phishing_mask
+        
+        urgency_count = bin(hits & self._urgency_mask).count("1")
+        authority_count = bin(hits & self._authority_mask).count("1")
+        phishing_count = bin(hits & self._phishing_mask).count("1")
+        
+        risk_score = 0.0
+        indicators = []
+        
+        # Check for urgency
+        if urgency_count > 0:
+            indicators.append(f"Urgency detected ({urgency_count} keywords)")
+            risk_score += 0.2
+        
+        # Check for authority
+        if authority_count > 0:
+            indicators.append(f"Authority claimed ({authority_count} keywords)")
+            risk_score += 0.2
+        
+        # Check for phishing indicators
+        if phishing_count > 0:
+            indicators.append(f"Phishing indicators ({phishing_count} found)")
+            risk_score += 0.3
+        
+        return urgency_count, authority_count, phishing_count, risk_score, indicators
+    
     def _is_suspicious_domain(self, domain: str) -> bool:
         """Check if domain is suspicious"""
         suspicious_domains = [
@@ -257,14 +311,19 @@ class SocialEngineeringDetector:
         return domain in suspicious_domains
     
     def _is_typosquatting(self, url: str) -> bool:
-        """Simple typosquatting detection"""
-        # This is a simplified version - in reality, you'd use more sophisticated algorithms
-        suspicious_patterns = [
-            "goog1e", "amaz0n", "paypa1", "micr0soft", "app1e"
-        ]
-        return any(pattern in url.lower() for pattern in suspicious_patterns)
-
-
-
-
-
+        """Typosquatting detection: known typo patterns or a registrable domain one edit away from a brand"""
+        url_lower = url.lower()
+        if self._typosquat_matcher.contains_any(url_lower):
+            return True
+        
+        try:
+            host = urlsplit(url_lower if "//" in url_lower else f"//{url_lower}").hostname or ""
+        except ValueError:
+            return False
+        
+        # Only the registrable label counts; subdomains are chosen freely by whoever owns the domain
+        brands = [brand for brand in self.typosquat_brands if len(brand) >= _TYPOSQUAT_MIN_BRAND_LENGTH]
+        return any(
+            _within_one_edit(token, brand)
+            for token in _HOST_TOKEN_SPLIT.split(_registrable_label(host)) for brand in brands
+        )